@@ -8,12 +8,64 @@ and FASTA files in Python easier, faster, and accessible to more users.
 
 """
 import os
+import io
 import gzip
-import pandas as pd
-import csv
-from Bio.Seq import Seq
-from Bio.SeqUtils import GC
-import matplotlib.pyplot as plt
+import mmap
+import numpy as np
+import queue
+import shutil
+import subprocess
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import chain, islice, zip_longest
+from types import SimpleNamespace
+
+try:
+    import rapidgzip
+except ImportError:
+    rapidgzip = None
+
+try:
+    from isal import igzip
+except ImportError:
+    igzip = None
+
+
+# Number of bytes read from a FASTQ file at a time while parsing. 128 KiB blocks stay in cache
+# while they are decoded and split, and still keep the number of Python-level reads small.
+READ_BLOCK_SIZE = 128 * 1024
+
+# Number of blocks that may be read ahead of the parser by a background thread.
+READ_AHEAD_BLOCKS = 8
+
+# Compressed files smaller than this (in bytes) are not worth decompressing in parallel with rapidgzip.
+PARALLEL_GZIP_MIN_SIZE = 4 * 1024 * 1024
+
+# Number of bytes searched for newlines at a time by _bufferColumns(), so the comparison mask stays small.
+NEWLINE_SCAN_SIZE = 16 * 1024 * 1024
+
+# Number of lines joined and compressed at a time while writing.
+WRITE_BLOCK_LINES = 4 * 65536
+
+
+@lru_cache(maxsize=None)
+def _pyarrow():
+    """Imports pyarrow (and pyarrow.compute) the first time it is needed, rather than
+    when fastTools is imported.
+    
+    Returns:
+        (module): The pyarrow module, or None if pyarrow is not installed or cannot be imported.
+    """
+    
+    try:
+        import pyarrow
+        import pyarrow.compute
+    except ImportError:
+        # Also covers a pyarrow install that was built against a different NumPy version.
+        return None
+    
+    return pyarrow
 
 
 class FastqFile:
@@ -44,23 +96,20 @@ class FastqFile:
         
         fastq1 = fastq1.split("/")[-1]
         
-        if fastq1 in os.listdir(current_dir):
+        if os.path.isfile(f"{current_dir}/{fastq1}"):
             self.fastq1 = fastq1
         else:
             print(f'{fastq1} not found in current directory')
             
             return
         
-        # Takes the full file name and shortens it to a readable name.
-        try:
-            self.sample = '_'.join(fastq1.split("_")[:2])
-        except:
-            self.sample = fastq1
+        # Takes the full file name and shortens it to a readable name (everything before the second '_').
+        self.sample = '_'.join(fastq1.split("_", 2)[:2])
         
         self.paired = paired
         
         if fastq2: 
-            if fastq2 in os.listdir(current_dir):
+            if os.path.isfile(f"{current_dir}/{fastq2}"):
                 self.paired = True
                 self.fastq2 = fastq2
             else:
@@ -69,97 +118,217 @@ class FastqFile:
                 print((f'{fastq2} not found in current directory.\n'
                        f'Continuing with single file {self.fastq1}'))
         else:
+            self.fastq2 = "None"
+            
             if self.paired:
+                # Swap '_R1_' for '_R2_' (or '_R2_' for '_R1_') in the fastq1 file name to get its mate's name.
                 if "_R1_" in fastq1:
-                    # Replace '_R1_' with '_R2_' in fastq1 file name.
-                    if fastq1.replace("_R1_", "_R2_") in os.listdir(current_dir):
-                        self.fastq2 = fastq1.replace("_R1_", "_R2_")
-                        fastq2 = True
-                    else:
-                        self.paired = False
-                        self.fastq2 = "None"
-                        fastq2 = False
-                        print((f"Attempted to find a mate for {self.fastq1}, but none was found.\n"
-                               f"Continuing with single file {self.fastq1}"))
+                    mate = fastq1.replace("_R1_", "_R2_")
                 elif "_R2_" in fastq1:
-                    # Replace '_R2_' with '_R1_' in fastq1 file name.
-                    holder = fastq1.replace("_R2_", "_R1_")
-                    if holder in os.listdir(current_dir):
-                        self.fastq2 = self.fastq1
-                        self.fastq1 = holder
-                        fastq2 = True
+                    mate = fastq1.replace("_R2_", "_R1_")
+                else:
+                    mate = None
+                
+                if mate is not None and os.path.isfile(f"{current_dir}/{mate}"):
+                    # The R1 file is always kept as self.fastq1.
+                    if "_R1_" in fastq1:
+                        self.fastq2 = mate
                     else:
-                        self.paired = False
-                        self.fastq2 = "None"
-                        fastq2 = False
-                        print((f"Attempted to find a mate for {self.fastq1}, but none was found.\n"
-                               f"Continuing with single file {self.fastq1}"))
+                        self.fastq1, self.fastq2 = mate, fastq1
                 else:
-                    fastq2 = False
                     self.paired = False
-                    self.fastq2 = "None"
                     print((f"Attempted to find a mate for {self.fastq1}, but none was found.\n"
                            f"Continuing with single file {self.fastq1}"))
-            else:
-                fastq2 = False
-                self.fastq2 = "None"
-                self.paired = False
             
-        # Read fastq1 into fqlines list.
-        if self.fastq1.endswith('.gz'):
-            with gzip.open(f"{current_dir}/{self.fastq1}", 'rt') as fastqFile:
-                fqlines = fastqFile.readlines()
-        else:
-            with open(self.fastq1, 'r') as fastqFile:
-                fqlines = fastqFile.readlines()
-           
-        if self.paired:
-            # If there is a reverse file, read it and add it to fqlines.
-            if self.fastq2.endswith('.gz'):
-                with gzip.open(f"{current_dir}/{self.fastq2}", 'rt') as fastq2File:
-                    fq2lines = fastq2File.readlines()
-            else:
-                with open(self.fastq2, 'r') as fastq2File:
-                    fq2lines = fastq2File.readlines()
-    
-            # Create a new file lines list, and add FASTQ reads in an interleaved orientation.
-            pairedLinesList = []
-        
-            for i in range(0, len(fqlines), 4):
-                pairedLinesList.append(fqlines[i])
-                pairedLinesList.append(fqlines[i+1])
-                pairedLinesList.append(fqlines[i+2])
-                pairedLinesList.append(fqlines[i+3])
-        
-                pairedLinesList.append(fq2lines[i])
-                pairedLinesList.append(fq2lines[i+1])
-                pairedLinesList.append(fq2lines[i+2])
-                pairedLinesList.append(fq2lines[i+3])
+        self._directory = current_dir
+        
+        # The files are not read until self.fastqDataFrame is first used.
+        self._fastqDataFrame = None
+        self._readCount = None
+        
+    
+    @property
+    def fastqDataFrame(self):
+        """Pandas DataFrame that holds Name, Seq, Direction and Qual columns for every read.
+        The FASTQ file(s) are parsed the first time this is accessed, and the same
+        DataFrame is returned afterwards.
+        """
+        
+        if self._fastqDataFrame is None:
+            import pandas as pd
+            
+            # Read fastq1 into columns of FASTQ names, sequences, directions and quality strings.
+            fqnameList, fqseqList, fqdirectionList, fqqualList = self._readFileColumns(self.fastq1)
+            
+            if self.paired:
+                mateColumns = self._readFileColumns(self.fastq2)
+                readCount = min(len(fqnameList), len(mateColumns[0]))
+                
+                if len(fqnameList) != len(mateColumns[0]):
+                    print((f"{self.fastq1} and {self.fastq2} contain different numbers of reads.\n"
+                           f"Reads without a mate were left out of the interleaved FastqFile."))
                 
-            # Create lists to hold FASTQ sequences and quality strings from pairedLinesList.
-            fqnameList = [pairedLinesList[i] for i in range(0, len(pairedLinesList), 4)]
-            fqseqList = [pairedLinesList[i] for i in range(1, len(pairedLinesList), 4)]
-            fqdirectionList = [pairedLinesList[i] for i in range(2, len(pairedLinesList), 4)]
-            fqqualList = [pairedLinesList[i] for i in range(3, len(pairedLinesList), 4)]
+                columns = (fqnameList, fqseqList, fqdirectionList, fqqualList)
                 
-                       
-        # If there is no reverse file, or an unpaired FastqFile object is desired.
+                # If only one of the files could be cut into Arrow arrays, fall back to lists for both.
+                if isinstance(columns[0], list) != isinstance(mateColumns[0], list):
+                    columns = [_columnList(column) for column in columns]
+                    mateColumns = [_columnList(column) for column in mateColumns]
+                
+                fqnameList, fqseqList, fqdirectionList, fqqualList = [
+                    _interleaveColumns(column, mateColumn, readCount) for column, mateColumn in zip(columns, mateColumns)]
+            
+            # Create a data frame "fastqDataFrame" from fqseqList and fqqualList
+            # Each column keeps its own 1D array (copy=False), rather than being consolidated into one 2D block.
+            self._fastqDataFrame = pd.DataFrame({'Name': _stringArray(fqnameList),
+                                                 'Seq': _stringArray(fqseqList),
+                                                 'Direction': _stringArray(fqdirectionList),
+                                                 'Qual': _stringArray(fqqualList)}, copy=False)
+        
+        return self._fastqDataFrame
+    
+    @fastqDataFrame.setter
+    def fastqDataFrame(self, dataframe):
+        self._fastqDataFrame = dataframe
+    
+    def _readFileColumns(self, fastq):
+        """Reads every record of one FASTQ file into four columns. When pyarrow is
+        installed, the whole file is memory-mapped (or decompressed into memory in one
+        piece), every newline is found in a single vectorized scan, and the columns are
+        cut out of the buffer as Arrow arrays by _bufferColumns(), without making a
+        Python string for each line. Otherwise the records are parsed a block at a time
+        into lists; files _bufferColumns() does not accept are parsed this way from the
+        buffer already in memory, rather than reading them again.
+        
+        Args:
+            self
+            fastq (str): Name of a .fastq or .fastq.gz file in this object's directory.
+            
+        Returns:
+            (tuple): pyarrow arrays or lists of name, sequence, direction and quality strings.
+        """
+        
+        path = f"{self._directory}/{fastq}"
+        
+        # The buffer is only worth cutting into Arrow arrays if pandas can keep them as columns.
+        if _pandasArrow() and hasattr(_pyarrow().compute, 'binary_slice'):
+            buffer = _mapInput(path)
+            columns = _bufferColumns(buffer)
+            
+            if columns is not None:
+                return columns
+            
+            # A memory map can be read like a file; decompressed bytes are wrapped without copying them.
+            fastqInput = io.BytesIO(buffer) if isinstance(buffer, bytes) else buffer
         else:
+            fastqInput = _openInput(path)
+        
+        fqnameList = []
+        fqseqList = []
+        fqdirectionList = []
+        fqqualList = []
+        
+        with fastqInput as fastqFile:
+            for names, seqs, directions, quals in _readColumns(fastqFile):
+                fqnameList.extend(names)
+                fqseqList.extend(seqs)
+                fqdirectionList.extend(directions)
+                fqqualList.extend(quals)
+        
+        return fqnameList, fqseqList, fqdirectionList, fqqualList
+    
+    
+    def _countFileReads(self, fastq):
+        """Counts the records in one FASTQ file by counting its lines a block at a time,
+        without parsing the records or building a DataFrame.
+        
+        Args:
+            self
+            fastq (str): Name of a .fastq or .fastq.gz file in this object's directory.
             
-            # Create lists to hold FASTQ sequences and quality strings from fqlines.
-            fqnameList = [fqlines[i] for i in range(0, len(fqlines), 4)]
-            fqseqList = [fqlines[i] for i in range(1, len(fqlines), 4)]
-            fqdirectionList = [fqlines[i] for i in range(2, len(fqlines), 4)]
-            fqqualList = [fqlines[i] for i in range(3, len(fqlines), 4)]
+        Returns:
+            (int): Number of reads in the file.
             
+        Raises:
+            ValueError: If the file ends with an incomplete record, as when building the DataFrame.
+        """
+        
+        lineCount = 0
+        tail = b''
+        
+        with _openInput(f"{self._directory}/{fastq}") as fastqFile:
+            for block in _readBlocks(fastqFile):
+                newlines = block.count(b'\n')
+                lineCount += newlines
+                extra = lineCount % 4
+                
+                # Keep the bytes after the last complete record, to check the end of the file.
+                if newlines > extra:
+                    cut = len(block)
+                    for _ in range(extra + 1):
+                        cut = block.rfind(b'\n', 0, cut)
+                    tail = block[cut + 1:]
+                else:
+                    tail += block
         
-        # Create a data frame "fastqDataFrame" from fqseqList and fqqualList
-        self.fastqDataFrame = pd.DataFrame({'Name': fqnameList, 'Seq': fqseqList, 
-                                      'Direction': fqdirectionList, 'Qual': fqqualList})
+        # The last line of the file has no trailing newline.
+        if tail and not tail.endswith(b'\n'):
+            lineCount += 1
         
+        if lineCount % 4 and tail.strip():
+            raise ValueError(f"Incomplete FASTQ record at end of file: {tail.decode('utf-8', 'replace')[:50]}")
+        
+        return lineCount // 4
+    
     
+    def iterRecords(self):
+        """Generator that streams reads straight from the FASTQ file(s) without building
+        self.fastqDataFrame, so files of any size can be processed in constant memory.
+        Reads from paired files are yielded in interleaved order.
+        
+        Args:
+            self
+            
+        Yields:
+            (tuple): Name, sequence, direction and quality lines of a single read.
+        """
+        
+        # Stream fastq1 one record at a time rather than reading every line into memory.
+        with _openInput(f"{self._directory}/{self.fastq1}") as fastqFile:
+            
+            if self.paired:
+                # If there is a reverse file, pull a record from each file in turn so reads are interleaved.
+                with _openInput(f"{self._directory}/{self.fastq2}") as fastq2File:
+                    for record, mate in zip_longest(_readRecords(fastqFile), _readRecords(fastq2File)):
+                        if record is None or mate is None:
+                            print((f"{self.fastq1} and {self.fastq2} contain different numbers of reads.\n"
+                                   f"Reads without a mate were left out of the interleaved FastqFile."))
+                            return
+                        
+                        yield record
+                        yield mate
+            
+            # If there is no reverse file, or an unpaired FastqFile object is desired.
+            else:
+                yield from _readRecords(fastqFile)
+        
+        
     def __len__(self):
-        return len(self.fastqDataFrame)
+        return self.numReads()
+    
+    def __bool__(self):
+        # Avoid counting every read just to test for an empty FastqFile.
+        if self._fastqDataFrame is not None or self._readCount is not None:
+            return self.numReads() > 0
+        
+        fastqs = [self.fastq1, self.fastq2] if self.paired else [self.fastq1]
+        
+        for fastq in fastqs:
+            with _openInput(f"{self._directory}/{fastq}") as fastqFile:
+                if not any(block.strip() for block in _readBlocks(fastqFile)):
+                    return False
+        
+        return True
     
     def __str__(self):
         return (f'{self.sample}')
@@ -172,38 +341,162 @@ class FastqFile:
                 f'self.sample\n'
                 f'self.paired\n'
                 f'self.fastqDataFrame\n'
-                f'Columns: {list(self.fastqDataFrame.columns)}\n')
+                f'Columns: {self._columns()}\n')
+    
+    def _columns(self):
+        # Avoid reading the files just to show the column names.
+        if self._fastqDataFrame is None:
+            return ['Name', 'Seq', 'Direction', 'Qual']
+        
+        return list(self._fastqDataFrame.columns)
                 
     def numReads(self):
-        return len(self.fastqDataFrame)
+        """Returns the number of reads in this FastqFile (both mates when paired). If the
+        DataFrame has not been built yet, the reads are counted from the file(s) without
+        building it, and the count is kept for later calls.
+        
+        Args:
+            self
+            
+        Returns:
+            (int): Number of reads.
+            
+        Raises:
+            ValueError: If a file ends with an incomplete record, as when building the DataFrame.
+        """
+        
+        if self._fastqDataFrame is not None:
+            return len(self._fastqDataFrame)
+        
+        if self._readCount is None:
+            readCount = self._countFileReads(self.fastq1)
+            
+            if self.paired:
+                # Reads without a mate are left out of the interleaved DataFrame.
+                readCount = 2 * min(readCount, self._countFileReads(self.fastq2))
+            
+            self._readCount = readCount
+        
+        return self._readCount
     
     
-    def averageQuality(self):
+    def averageQuality(self, method='lut'):
         """Appends a column to self.fastqDataFrame that contains average quality scores for each read.
+        Quality strings are only decoded when this is called; the Qual column itself
+        always stays as the Phred+33 strings read from the file.
         
         Args:
             self
+            method (str) (default: 'lut'): 'lut' decodes every quality string at once with qScoreTable and NumPy.
+                                           'dict' looks up each symbol in qScoreDict, one read at a time (slow).
             
         Returns:
             None
         
         """
         
-        quallist = self.fastqDataFrame['Qual']
-        qualscores = []
-        
-        # Create a list for the quality strings and append the corresponding quality scores
-        for item in quallist:
-            qualstringseries = pd.Series([qScoreDict[symbol] for symbol in item.strip()])
+        if method == 'dict':
+            import pandas as pd
+            
+            qualscores = []
+            
+            # Create a list for the quality strings and append the corresponding quality scores
+            for item in self.fastqDataFrame['Qual']:
+                qualstringseries = pd.Series([qScoreDict[symbol] for symbol in item.strip()], dtype=float)
+                
+                # Create a variable for the overall average quality of each line
+                qualscores.append(qualstringseries.mean())
             
-            # Create a variable for the overall average quality of each line
-            avequal = qualstringseries.mean()    
-            qualscores.append(avequal)
+            self.fastqDataFrame['Avg Qual'] = qualscores
+            
+            return
+        
+        if method != 'lut':
+            raise ValueError(f"method must be 'lut' or 'dict', not {method!r}")
+        
+        # Always decode the current Qual column, which may have been edited since the last call.
+        qualvalues, quallengths = self._qualScores()
+        qualMatrix = _qualScoreMatrix(qualvalues, quallengths)
+        
+        if qualMatrix is not None:
+            # All reads are the same length, so average across each row of the (reads, length) matrix.
+            qualscores = _qualRowMeans(qualMatrix)
+        else:
+            # Sum the scores belonging to each read, then divide by each read's length.
+            qualscores = _qualMeans(_readSums(qualvalues, quallengths), quallengths)
         
         # Adds the quality scores in a coloumn to the dataframe
         self.fastqDataFrame['Avg Qual'] = qualscores
         
         
+    def qualityMatrix(self):
+        """Decodes the Qual column into a (reads, length) uint8 NumPy array holding the
+        quality score of every base, one row per read, for the common case where all reads
+        are the same length. Quality reports then become array reductions, e.g.
+        matrix.mean(axis=0) for the average quality at each position. Every call decodes the
+        current Qual column again, so keep the returned matrix rather than calling this repeatedly.
+        
+        Args:
+            self
+            
+        Returns:
+            (:obj: np.ndarray): Quality score matrix, or None if the reads are not all the same length.
+        """
+        
+        return _qualScoreMatrix(*self._qualScores())
+        
+        
+    def _qualScores(self):
+        """Concatenates every quality string in self.fastqDataFrame['Qual'] into one
+        contiguous buffer and decodes all of it at once with bytes.translate(), which
+        maps each Phred+33 symbol to its score through a 256-byte table in C.
+        Raises ValueError if any quality string holds a byte that is not a Phred+33 symbol.
+        
+        Args:
+            self
+            
+        Returns:
+            (tuple): uint8 array of every read's quality scores, end to end, and int64 array of each read's length.
+        """
+        
+        quals = self.fastqDataFrame['Qual'].str.strip()
+        qualbytes, quallengths = _columnBytes(quals)
+        qualvalues = np.frombuffer(qualbytes.translate(qScoreTable), dtype=np.uint8)
+        
+        invalid = np.flatnonzero(qualvalues == 255)
+        
+        if len(invalid):
+            symbol = qualbytes[invalid[0]:invalid[0] + 1].decode('ascii', 'replace')
+            read = np.searchsorted(np.cumsum(quallengths), invalid[0], side='right')
+            raise self._invalidQuality(symbol, read)
+        
+        return qualvalues, quallengths
+        
+        
+    def _invalidQuality(self, symbol, read):
+        """Builds the error for a quality string holding a byte that is not a Phred+33 symbol,
+        naming the row of self.fastqDataFrame it is in. Interleaved rows with an even index
+        come from self.fastq1 and odd ones from self.fastq2, so the file is named as well.
+        
+        Args:
+            self
+            symbol (str): The invalid quality symbol.
+            read (int): Position of the row in self.fastqDataFrame.
+            
+        Returns:
+            (ValueError): Error to raise.
+        """
+        
+        row = self.fastqDataFrame.index[read]
+        message = f"Invalid quality symbol {symbol!r} in row {row!r} of self.fastqDataFrame"
+        
+        if isinstance(row, (int, np.integer)):
+            fastq = self.fastq2 if self.paired and row % 2 else self.fastq1
+            message += f" (read from {fastq})"
+        
+        return ValueError(message)
+        
+        
     def reverseComplement(self):
         """Creates a new column in self.fastqDataFrame to hold reverse complement
         DNA sequences.
@@ -215,7 +508,7 @@ class FastqFile:
             none
         """
         
-        self.fastqDataFrame['Reverse Complement'] = self.fastqDataFrame['Seq'].apply(revComp)
+        self.fastqDataFrame['Reverse Complement'] = _reverseComplements(self.fastqDataFrame['Seq'])
         
         
     def aminoAcid(self):
@@ -228,7 +521,7 @@ class FastqFile:
             none
         """
 
-        self.fastqDataFrame['AA Sequence'] = self.fastqDataFrame['Seq'].apply(aa)
+        self.fastqDataFrame['AA Sequence'] = _translate(self.fastqDataFrame['Seq'])
         
         
     def calculateGC(self):
@@ -242,7 +535,53 @@ class FastqFile:
             none
         """
         
-        self.fastqDataFrame['GC Content'] = self.fastqDataFrame['Seq'].apply(gc_content)
+        self.fastqDataFrame['GC Content'] = _gcContent(self.fastqDataFrame['Seq'])
+        
+        
+    def computeAll(self):
+        """Creates the Reverse Complement, GC Content and Avg Qual columns in self.fastqDataFrame
+        at once. When numba is installed, the Seq and Qual columns are concatenated once and
+        a single parallel kernel visits every base and quality symbol once: it counts G/C,
+        writes each read's reverse complement straight into the buffer that becomes the
+        Reverse Complement column, and sums quality scores, rather than each of
+        reverseComplement(), calculateGC() and averageQuality() walking the data on its
+        own. Without numba, those three methods are called in turn.
+        
+        Args:
+            self
+            
+        Returns:
+            none
+        """
+        
+        kernels = _numba()
+        
+        if kernels is None:
+            self.reverseComplement()
+            self.calculateGC()
+            self.averageQuality()
+            
+            return
+        
+        seqbytes, seqlengths = _columnBytes(self.fastqDataFrame['Seq'])
+        qualbytes, quallengths = _columnBytes(self.fastqDataFrame['Qual'].str.strip())
+        seqOffsets = np.concatenate(([0], np.cumsum(seqlengths)))
+        qualOffsets = np.concatenate(([0], np.cumsum(quallengths)))
+        
+        gcCounts, qualsums, invalid, revcomps = kernels.allStats(np.frombuffer(seqbytes, dtype=np.uint8), seqOffsets,
+                                                                 np.frombuffer(qualbytes, dtype=np.uint8), qualOffsets,
+                                                                 _gcLUT, _revCompLUT, qScoreLUT.view(np.uint8))
+        
+        if invalid.any():
+            read = np.flatnonzero(invalid)[0]
+            readQuals = qualbytes[qualOffsets[read]:qualOffsets[read + 1]]
+            position = readQuals.translate(qScoreTable).index(255)
+            symbol = readQuals[position:position + 1].decode('ascii', 'replace')
+            raise self._invalidQuality(symbol, read)
+        
+        self.fastqDataFrame['Reverse Complement'] = _bufferStringArray(revcomps, seqOffsets)
+        self.fastqDataFrame['GC Content'] = _gcPercent(gcCounts, seqlengths)
+        self.fastqDataFrame['Avg Qual'] = _qualMeans(qualsums, quallengths)
         
         
     def plotAverageQuality(self, outfile=False):
@@ -274,6 +613,8 @@ class FastqFile:
                         
                         return
                 
+            import matplotlib.pyplot as plt
+            
             fig = plt.figure(figsize=(9, 6))
             
             sns.distplot(self.fastqDataFrame['Avg Qual'], kde=False)
@@ -327,6 +668,8 @@ class FastqFile:
                         
                         return
             
+            import matplotlib.pyplot as plt
+            
             fig = plt.figure(figsize=(9, 6))
             
             sns.distplot(self.fastqDataFrame['GC Content'], kde=False)
@@ -353,60 +696,30 @@ class FastqFile:
             
 
     def writeFASTQ(self, outfile):
-        """Takes an outfile string and a dataframe. Converts 2D DataFrame to a single
-        column resembling a FASTQ file with each line as a row. This makes writing the
-        output file much faster than using Python's built-in write function in a loop.
+        """Takes an outfile string. Interleaves the Name, Seq, Direction and Qual columns
+        of self.fastqDataFrame into FASTQ lines, then joins and gzip compresses them
+        a block of lines at a time, so no per-line Python writes are needed. If
+        self.fastqDataFrame has not been built yet, reads are streamed straight from
+        the input file(s) to outfile instead.
         
         Args:
             outfile (str): Name of the output file, cleaned and formatted by this program.
-            dataframe (:obj: pd.DataFrame): Pandas dataframe containing FASTQ info, each read on one line.
         
         """
         
+        if self._fastqDataFrame is None:
+            # The DataFrame has not been built, so stream reads straight from the input file(s) to outfile.
+            _writeRecords(outfile, self.iterRecords())
+            
+            return
+        
         try:
-            # Create one-column DataFrames from the columns of dataframe.
-            namedf = pd.DataFrame(self.fastqDataFrame['Name'])
-            seqdf = pd.DataFrame(self.fastqDataFrame['Seq'])
-            directiondf = pd.DataFrame(self.fastqDataFrame['Direction'])
-            qualdf = pd.DataFrame(self.fastqDataFrame['Qual'])
-        except:
+            columns = [np.asarray(self.fastqDataFrame[column], dtype=object)
+                       for column in ('Name', 'Seq', 'Direction', 'Qual')]
+        except KeyError:
             return "This doesn't appear to be a FastqFile object."
         
-        # Give each row a pseudo-index, offset from 0-4, stepping 4 for each index.
-        nameid = list(range(0, len(namedf)*4, 4))
-        seqid = list(range(1, len(namedf)*4, 4))
-        dirid = list(range(2, len(namedf)*4, 4))
-        qualid = list(range(3, len(namedf)*4, 4))
-        
-        # Add an 'id' column to each individual DataFrame.
-        namedf['id'] = nameid
-        seqdf['id'] = seqid
-        directiondf['id'] = dirid
-        qualdf['id'] = qualid
-        
-        # Create new column names.
-        namedf.columns = ["line", "id"]
-        seqdf.columns = ["line", "id"]
-        directiondf.columns = ["line", "id"]
-        qualdf.columns = ["line", "id"]
-        
-        # Concatenate individual DataFrames into one longdf (pseudo-indeces out of order).
-        longdf = pd.concat([namedf, seqdf, directiondf, qualdf])
-        
-        # Sort values in longdf by thier pseudo-indeces, restoring original FASTQ structure.
-        longdf.sort_values('id', inplace=True)
-        
-        # Reset index so there are no multiple indeces.
-        longdf.reset_index(drop=True, inplace=True)
-        
-        # Drop pseudo-indeces.
-        longdf.drop('id', axis=1, inplace=True)
-        
-        # Remove newline characters.
-        longdf['line'] = longdf['line'].apply(removeNewline)
-        
-        # Use pandas to write DataFrame as FASTQ file (faster than built-in Python).
-        longdf.to_csv(outfile, index=False, header=False, quoting=csv.QUOTE_NONE, quotechar="", escapechar="\\", compression='gzip')
+        _writeInterleaved(outfile, columns)
        
         
 class FastaFile:
@@ -423,26 +736,20 @@ class FastaFile:
     def __init__(self, fasta):
         self.fasta = fasta
         
-        # Read fasta into falines list.
-        if fasta.endswith('.gz'):
-            with gzip.open(fasta, 'rt') as fastaFile:
-                falines = fastaFile.readlines()
-        else:
-            with open(fasta, 'r') as fastaFile:
-                falines = fastaFile.readlines()
-
-        # Create lists to hold FASTQ sequences and quality strings from fqlines
+        # Create lists to hold FASTA names and sequences.
         fanameList = []
         faseqList = []
         
-        # Starting at index 1, add every other line to faseqList
-        for i in range(0, len(falines), 2):
-            fanameList.append(falines[i].strip())
-
-        for j in range(1, len(falines), 2):
-            faseqList.append(falines[j].strip())
-
-        self.fastaDataFrame = pd.DataFrame({'Name': fanameList, 'Seq': faseqList})
+        # Stream fasta one record at a time rather than reading every line into memory.
+        with _openInput(fasta) as fastaFile:
+            for name, seq in _readFasta(fastaFile):
+                fanameList.append(name)
+                faseqList.append(seq)
+        
+        import pandas as pd
+        
+        self.fastaDataFrame = pd.DataFrame({'Name': _stringArray(fanameList),
+                                            'Seq': _stringArray(faseqList)}, copy=False)
         
         
     def __len__(self):
@@ -472,7 +779,7 @@ class FastaFile:
             none
         """
         
-        self.fastaDataFrame['Reverse Complement'] = self.fastaDataFrame['Seq'].apply(revComp)
+        self.fastaDataFrame['Reverse Complement'] = _reverseComplements(self.fastaDataFrame['Seq'])
         
         
     def aminoAcid(self):
@@ -485,7 +792,7 @@ class FastaFile:
             none
         """
         
-        self.fastaDataFrame['AA Sequence'] = self.fastaDataFrame['Seq'].apply(aa)
+        self.fastaDataFrame['AA Sequence'] = _translate(self.fastaDataFrame['Seq'])
         
         
     def calculateGC(self):
@@ -499,7 +806,7 @@ class FastaFile:
             none
         """
         
-        self.fastaDataFrame['GC Content'] = self.fastaDataFrame['Seq'].apply(gc_content)
+        self.fastaDataFrame['GC Content'] = _gcContent(self.fastaDataFrame['Seq'])
         
         
     def plotGCcontent(self, outfile=False):
@@ -530,6 +837,8 @@ class FastaFile:
                         
                         return
                     
+            import matplotlib.pyplot as plt
+            
             fig = plt.figure(figsize=(9, 6))
             
             sns.distplot(self.fastaDataFrame['GC Content'], kde=False)
@@ -556,9 +865,9 @@ class FastaFile:
         
         
     def writeFASTA(self, outfile):
-        """Takes an outfile string and a dataframe. Converts 2D DataFrame to a single
-        column resembling a FASTA file with each line as a row. This makes writing the
-        output file much faster than using Python's built-in write function in a loop.
+        """Takes an outfile string. Interleaves the Name and Seq columns of
+        self.fastaDataFrame into FASTA lines, then joins and gzip compresses them
+        a block of lines at a time, so no per-line Python writes are needed.
         
         Args:
             self
@@ -569,41 +878,11 @@ class FastaFile:
         
         """
         try:
-            # Create one-column DataFrames from the columns of dataframe.
-            namedf = pd.DataFrame(self.fastaDataFrame['Name'])
-            seqdf = pd.DataFrame(self.fastaDataFrame['Seq'])
-        except:
+            columns = [np.asarray(self.fastaDataFrame[column], dtype=object) for column in ('Name', 'Seq')]
+        except KeyError:
             return "This doesn't appear to be a FastaFile object."
         
-        # Give each row a pseudo-index, offset from 0-4, stepping 4 for each index.
-        nameid = list(range(0, len(namedf)*4, 4))
-        seqid = list(range(1, len(namedf)*4, 4))
-        
-        # Add an 'id' column to each individual DataFrame.
-        namedf['id'] = nameid
-        seqdf['id'] = seqid
-        
-        # Create new column names.
-        namedf.columns = ["line", "id"]
-        seqdf.columns = ["line", "id"]
-        
-        # Concatenate individual DataFrames into one longdf (pseudo-indeces out of order).
-        longdf = pd.concat([namedf, seqdf])
-        
-        # Sort values in longdf by thier pseudo-indeces, restoring original FASTQ structure.
-        longdf.sort_values('id', inplace=True)
-        
-        # Reset index so there are no multiple indeces.
-        longdf.reset_index(drop=True, inplace=True)
-        
-        # Drop pseudo-indeces.
-        longdf.drop('id', axis=1, inplace=True)
-        
-        # Remove newline characters.
-        longdf['line'] = longdf['line'].apply(removeNewline)
-        
-        # Use pandas to write DataFrame as FASTQ file (faster than built-in Python).
-        longdf.to_csv(outfile, index=False, header=False, quoting=csv.QUOTE_NONE, quotechar="", escapechar="\\", compression='gzip')
+        _writeInterleaved(outfile, columns)
        
         
 def revComp(seqString):
@@ -613,23 +892,28 @@ def revComp(seqString):
     return a reverse complement DNA sequence string. If you require a Bio.Seq object, 
     use biopython directly instead of this function.
     
+    Complements are looked up with str.translate() in a table that covers IUPAC
+    ambiguity codes in either case, giving the same result as Bio.Seq's
+    reverse_complement() without building a Seq object for every read.
+    
     Args:
         seqString (str): DNA sequence string.
         
     Returns:
-        revComp (str): DANE sequence string.
+        revComp (str): DNA sequence string.
     """
     
-    revComp = str(Seq(seqString).reverse_complement())
+    revComp = seqString.translate(_revCompTable)[::-1]
     
     return revComp
 
 
 def gc_content(seqString):
-    """Custom function used by FastqFile and FastaFile objects in a pandas apply() call to
-    calculate the GC content of a DNA sequence. This function can also be called on
-    a sequence manually with fastTools.gc_content(yourSequence). Same exact usage
-    as biopython's Bio.SeqUtils GC() function.
+    """Custom function to calculate the GC content of a DNA sequence, called on a
+    sequence manually with fastTools.gc_content(yourSequence). Same exact usage and
+    result as biopython's Bio.SeqUtils GC() function: G, C and S (G or C) bases of
+    either case are counted. FastqFile and FastaFile objects use the vectorized
+    _gcContent() for whole columns instead.
     
     Args:
         seqString (str): DNA sequence string.
@@ -637,9 +921,14 @@ def gc_content(seqString):
     Returns: (float): GC content of given DNA sequence in percent.
     """
     
-    GCpercent = GC(seqString)
+    if not seqString:
+        return 0.0
+    
+    gcCount = sum(seqString.count(base) for base in 'GCSgcs')
     
-    return GCpercent        
+    GCpercent = gcCount * 100.0 / len(seqString)
+    
+    return GCpercent
 
 
 def aa(seqString):
@@ -656,25 +945,910 @@ def aa(seqString):
         amino (str): Amino Acid string.
     """
     
-    amino = str(Seq(seqString).translate())
+    # One string is translated codon by codon from _codonBytes, which is cheaper than
+    # building the arrays _translate() uses for whole columns.
+    masks = seqString.encode('utf-8').translate(_baseMaskTable)
+    codonEnd = len(masks) // 3 * 3
+    aminos = bytes([_codonBytes[(first << 8) | (second << 4) | third]
+                    for first, second, third in zip(masks[0:codonEnd:3], masks[1:codonEnd:3], masks[2:codonEnd:3])])
+    
+    if 0 in aminos:
+        from Bio.Seq import Seq
+        
+        return str(Seq(seqString).translate())
+    
+    amino = aminos.decode('ascii')
     
     return amino
 
 
-def removeNewline(x):
-    """Custom function to use with apply() in a pandas DataFrame. Simply removes
-    new line characters from strings in a column.
+def _openInput(path):
+    """Opens a FASTQ/FASTA file, compressed (.gz) or not, for reading in binary mode.
+    Large compressed files are decompressed in parallel across all cores with
+    rapidgzip when it is installed and more than one core is available. Otherwise
+    ISA-L's SIMD accelerated inflate from python-isal is used, falling back to
+    Python's built-in gzip module.
+    
+    Args:
+        path (str): Path to a .fastq, .fastq.gz, .fasta or .fasta.gz file.
+        
+    Returns:
+        (file object): Binary mode file object.
     """
     
-    x = x.strip('\n')
+    if path.endswith('.gz'):
+        # Parallel decompression only pays for its thread start-up on multi-core machines and large files.
+        threads = os.cpu_count() or 1
+        
+        if rapidgzip is not None and threads > 1 and os.path.getsize(path) >= PARALLEL_GZIP_MIN_SIZE:
+            # RapidgzipFile is a raw stream, so buffer it to give FastaFile fast line iteration.
+            return io.BufferedReader(rapidgzip.RapidgzipFile(path, parallelization=threads), READ_BLOCK_SIZE)
+        
+        if igzip is not None:
+            return igzip.open(path, 'rb')
+        
+        return gzip.open(path, 'rb')
     
-    return x
-     
+    return open(path, 'rb')
+
+
+def _readBlocks(fastqFile):
+    """Generator that yields READ_BLOCK_SIZE blocks of bytes from an open file object.
+    On multi-core machines, blocks are read ahead on a background thread, so decompression
+    (which releases the GIL in zlib and rapidgzip) runs while the previous block is being
+    parsed. With a single core the thread cannot overlap anything, so blocks are read directly.
+    
+    Args:
+        fastqFile (file object): Binary mode file object.
+        
+    Yields:
+        (bytes): The next block of the file.
+    """
+    
+    if (os.cpu_count() or 1) < 2:
+        block = fastqFile.read(READ_BLOCK_SIZE)
+        
+        while block:
+            yield block
+            block = fastqFile.read(READ_BLOCK_SIZE)
+        
+        return
+    
+    blockQueue = queue.Queue(maxsize=READ_AHEAD_BLOCKS)
+    stop = threading.Event()
+    
+    def readAhead():
+        try:
+            block = True
+            
+            while block and not stop.is_set():
+                block = fastqFile.read(READ_BLOCK_SIZE)
+                blockQueue.put(block)
+        except Exception as error:
+            blockQueue.put(error)
+    
+    reader = threading.Thread(target=readAhead, daemon=True)
+    reader.start()
+    
+    try:
+        while True:
+            block = blockQueue.get()
+            
+            if isinstance(block, Exception):
+                raise block
+            
+            if not block:
+                return
+            
+            yield block
+    finally:
+        # Let the reader thread finish if it is waiting to hand over another block.
+        stop.set()
+        
+        while reader.is_alive():
+            try:
+                blockQueue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def _readColumns(fastqFile):
+    """Generator that scans an open FASTQ file object in large blocks and yields the
+    complete records in each block as four columns. Each block is decoded as UTF-8 and split
+    into lines in one call each, and the columns are taken with strided slices, so
+    every column list is allocated at its final size instead of growing one append
+    at a time. A partial record at the end of a block is carried over to the next.
+    
+    Args:
+        fastqFile (file object): Binary mode FASTQ file object.
+        
+    Yields:
+        (tuple): Lists of the name, sequence, direction and quality lines in a block, without newlines.
+    """
+    
+    blocks = _readBlocks(fastqFile)
+    remainder = ''
+    partialLine = b''
+    
+    while True:
+        block = next(blocks, b'')
+        
+        # Only decode up to the last newline, so that a multibyte UTF-8 character is never split between blocks.
+        cut = block.rfind(b'\n') + 1
+        
+        if not block:
+            data, partialLine = partialLine, b''
+        elif cut:
+            data, partialLine = partialLine + block[:cut], block[cut:]
+        else:
+            data, partialLine = b'', partialLine + block
+        
+        text = remainder + data.decode('utf-8')
+        
+        if not block and text and not text.endswith('\n'):
+            # The last line of the file has no trailing newline.
+            text += '\n'
+        
+        # The last entry is an incomplete line, or empty if the text ends with a newline.
+        lines = text.split('\n')
+        end = (len(lines) - 1) // 4 * 4
+        
+        if end:
+            yield lines[0:end:4], lines[1:end:4], lines[2:end:4], lines[3:end:4]
         
+        remainder = '\n'.join(lines[end:])
+        
+        if not block:
+            if remainder.strip():
+                raise ValueError(f"Incomplete FASTQ record at end of file: {remainder[:50]}")
+            
+            return
 
-      
-qScoreDict = {'!': 0, '"': 1, '#': 2, '$': 3, '%': 4, '&': 5, '\'': 6, '(': 7, ')': 8, '*': 9, '+': 10,
-                ',': 11, '-': 12, '.': 13, '/': 14, '0': 15, '1': 16, '2': 17, '3': 18, '4': 19, '5': 20,
-                '6': 21, '7': 22, '8': 23, '9': 24, ':': 25, ';': 26, '<': 27, '=': 28, '>': 29, '?': 30,
-                '@': 31, 'A': 32, 'B': 33, 'C': 34, 'D': 35, 'E': 36, 'F': 37, 'G': 38, 'H': 39, 'I': 40,
-                'J': 41, 'K': 42}
\ No newline at end of file
+
+def _readRecords(fastqFile):
+    """Generator that yields one record at a time from an open FASTQ file object.
+    
+    Args:
+        fastqFile (file object): Binary mode FASTQ file object.
+        
+    Yields:
+        (tuple): Name, sequence, direction and quality lines of a single read, without newlines.
+    """
+    
+    for columns in _readColumns(fastqFile):
+        yield from zip(*columns)
+
+
+def _mapInput(path):
+    """Makes the whole of a FASTQ file available as one buffer. Plain files are
+    memory-mapped, so pages are only read in as they are scanned; compressed files
+    are decompressed into memory in one piece.
+    
+    Args:
+        path (str): Path to a .fastq or .fastq.gz file.
+        
+    Returns:
+        (bytes-like): Contents of the file.
+    """
+    
+    if path.endswith('.gz'):
+        with _openInput(path) as fastqFile:
+            return fastqFile.read()
+    
+    with open(path, 'rb') as fastqFile:
+        # mmap cannot map an empty file.
+        if not os.fstat(fastqFile.fileno()).st_size:
+            return b''
+        
+        return mmap.mmap(fastqFile.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _bufferColumns(buffer):
+    """Cuts the name, sequence, direction and quality columns of a FASTQ file straight
+    out of a buffer holding the whole file. The positions of all newlines are found
+    with vectorized scans of NEWLINE_SCAN_SIZE bytes at a time, the buffer is viewed as
+    an Arrow array of lines without copying it, and every 4th line is taken into each
+    column by Arrow. As in _readColumns(), blank lines after the last record are ignored
+    and the last line does not need to end with a newline.
+    
+    Args:
+        buffer (bytes-like): Contents of a FASTQ file, e.g. from _mapInput().
+        
+    Returns:
+        (list): pyarrow large_string arrays of name, sequence, direction and quality lines, without
+            newlines; or None if the file holds no records or ends with an incomplete record, which
+            are left to _readColumns().
+    """
+    
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    lineEnds = np.concatenate([np.flatnonzero(data[start:start + NEWLINE_SCAN_SIZE] == ord('\n')) + start
+                               for start in range(0, len(data), NEWLINE_SCAN_SIZE)] or [np.zeros(0, dtype=np.int64)])
+    
+    # A last line without a newline is counted as ending just past the end of the buffer.
+    unterminated = len(data) and data[-1] != ord('\n')
+    
+    if unterminated:
+        lineEnds = np.append(lineEnds, len(data))
+    
+    lineCount = len(lineEnds) // 4 * 4
+    
+    if not lineCount or data[lineEnds[lineCount - 1] + 1:].tobytes().strip():
+        return None
+    
+    pa = _pyarrow()
+    lineStarts = np.concatenate(([0], lineEnds[:lineCount] + 1))
+    lineStarts[-1] = min(lineStarts[-1], len(data))
+    lines = pa.Array.from_buffers(pa.large_binary(), lineCount,
+                                  [None, pa.py_buffer(lineStarts), pa.py_buffer(buffer)])
+    
+    columns = []
+    
+    for offset in range(4):
+        column = lines.take(pa.array(np.arange(offset, lineCount, 4)))
+        
+        # Drop the newline from the end of each line; the cast checks the lines are valid text.
+        if offset == 3 and unterminated and lineCount == len(lineEnds):
+            column = pa.concat_arrays([pa.compute.binary_slice(column[:-1], 0, -1), column[-1:]])
+        else:
+            column = pa.compute.binary_slice(column, 0, -1)
+        
+        columns.append(column.cast(pa.large_string()))
+    
+    return columns
+
+
+def _interleaveColumns(column, mateColumn, readCount):
+    """Interleaves the first readCount values of a column from each of a pair of FASTQ
+    files, so that every read is followed by its mate.
+    
+    Args:
+        column (list or pa.Array): Column values from the R1 file.
+        mateColumn (list or pa.Array): The same column from the R2 file.
+        readCount (int): Number of reads to take from each file.
+        
+    Returns:
+        (list or pa.Array): Interleaved column, of length 2 * readCount.
+    """
+    
+    if isinstance(column, list):
+        # Strided slice assignment, instead of appending read by read.
+        pairedColumn = [None] * (2 * readCount)
+        pairedColumn[0::2] = column[:readCount]
+        pairedColumn[1::2] = mateColumn[:readCount]
+        
+        return pairedColumn
+    
+    pa = _pyarrow()
+    order = np.empty(2 * readCount, dtype=np.int64)
+    order[0::2] = np.arange(readCount)
+    order[1::2] = order[0::2] + readCount
+    
+    return pa.concat_arrays([column.slice(0, readCount), mateColumn.slice(0, readCount)]).take(pa.array(order))
+
+
+def _columnList(column):
+    """Returns a column from FastqFile._readFileColumns() as a list of strings."""
+    
+    return column if isinstance(column, list) else column.to_pylist()
+
+
+@contextmanager
+def _openGzipOutput(outfile):
+    """Context manager that opens a gzip compressed output file for writing bytes.
+    If pigz is on the PATH, compression is piped through it so that all cores
+    are used. Otherwise python-isal (ISA-L) is used at its fastest level when it
+    is installed, falling back to Python's built-in gzip module.
+    
+    Args:
+        outfile (str): Name of the output file.
+        
+    Yields:
+        (file object): Binary mode file object that compresses what is written to it.
+    """
+    
+    pigz = shutil.which('pigz')
+    
+    if pigz is None and igzip is not None:
+        with igzip.open(outfile, 'wb', compresslevel=1) as gzipFile:
+            yield gzipFile
+        
+        return
+    
+    if pigz is None:
+        with gzip.open(outfile, 'wb') as gzipFile:
+            yield gzipFile
+        
+        return
+    
+    with open(outfile, 'wb') as outFile:
+        process = subprocess.Popen([pigz, '-p', str(os.cpu_count() or 1), '-c'],
+                                   stdin=subprocess.PIPE, stdout=outFile)
+        try:
+            yield process.stdin
+        except BaseException:
+            # Keep the original error rather than reporting pigz's exit status.
+            process.stdin.close()
+            process.wait()
+            raise
+        
+        process.stdin.close()
+        
+        if process.wait() != 0:
+            raise OSError(f"pigz was unable to compress {outfile}")
+
+
+def _readFasta(fastaFile):
+    """Generator that yields one record at a time from an open FASTA file object.
+    Sequences that are wrapped over several lines are joined back into a single
+    sequence string. Lines are handled as bytes and each record is decoded once.
+    
+    Args:
+        fastaFile (file object): Binary mode FASTA file object.
+        
+    Yields:
+        (tuple): Name line and sequence of a single record, without newlines.
+    """
+    
+    name = None
+    seqLines = []
+    
+    for line in fastaFile:
+        line = line.strip()
+        
+        if line.startswith(b'>'):
+            if name is not None:
+                yield name.decode('utf-8'), b''.join(seqLines).decode('utf-8')
+            
+            name = line
+            seqLines = []
+        elif line:
+            seqLines.append(line)
+    
+    if name is not None:
+        yield name.decode('utf-8'), b''.join(seqLines).decode('utf-8')
+
+
+def _writeInterleaved(outfile, columns):
+    """Writes equal-length columns as a gzip compressed file with one line per value,
+    taking a value from each column in turn (Name, Seq, Direction, Qual for FASTQ;
+    Name, Seq for FASTA). Shared by FastqFile.writeFASTQ and FastaFile.writeFASTA.
+    
+    Args:
+        outfile (str): Name of the output file.
+        columns (list): Arrays of line strings, in the order they appear in each record.
+        
+    Returns:
+        None
+    """
+    
+    linesPerRecord = len(columns)
+    
+    # Interleave the columns by strided assignment, restoring original file structure without a sort.
+    lines = np.empty(len(columns[0]) * linesPerRecord, dtype=object)
+    
+    for offset, column in enumerate(columns):
+        lines[offset::linesPerRecord] = column
+    
+    # Write the lines as gzip compressed bytes, a block at a time to keep memory use down.
+    with _openGzipOutput(outfile) as outFile:
+        for start in range(0, len(lines), WRITE_BLOCK_LINES):
+            outFile.write(('\n'.join(lines[start:start + WRITE_BLOCK_LINES]) + '\n').encode('utf-8'))
+
+
+def _writeRecords(outfile, records):
+    """Writes records from an iterable of line tuples as a gzip compressed file, one
+    line per value, without first collecting them into arrays or a DataFrame.
+    
+    Args:
+        outfile (str): Name of the output file.
+        records (iterable): Tuples of line strings, such as those from FastqFile.iterRecords().
+        
+    Returns:
+        None
+    """
+    
+    with _openGzipOutput(outfile) as outFile:
+        while True:
+            # Join and compress a block of records at a time to keep memory use down.
+            block = list(islice(records, WRITE_BLOCK_LINES // 4))
+            
+            if not block:
+                return
+            
+            outFile.write(('\n'.join(chain.from_iterable(block)) + '\n').encode('utf-8'))
+
+
+def _readSums(values, lengths):
+    """Sums a flat array of per-base values within each read, where the reads are
+    stored end to end. Reads of length 0 get a sum of 0.
+    
+    Args:
+        values (:obj: np.ndarray): uint8 array of per-base values of every read, end to end.
+        lengths (:obj: np.ndarray): Number of bases in each read.
+        
+    Returns:
+        (:obj: np.ndarray): int64 array with the sum for each read.
+    """
+    
+    if len(lengths) and (lengths == lengths[0]).all():
+        # Equal-length reads can be summed across the rows of a (reads, length) matrix, which is faster.
+        return values.reshape(len(lengths), lengths[0]).sum(axis=1, dtype=np.int64)
+    
+    kernels = _numba()
+    
+    if kernels is not None:
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        
+        return kernels.readSums(values, offsets)
+    
+    sums = np.zeros(len(lengths), dtype=np.int64)
+    nonempty = lengths > 0
+    
+    if nonempty.any():
+        # reduceat sums from each offset to the next, so empty reads are left out of the offsets.
+        offsets = np.cumsum(lengths) - lengths
+        sums[nonempty] = np.add.reduceat(values, offsets[nonempty], dtype=np.int64)
+    
+    return sums
+
+
+def _columnBytes(strings):
+    """Concatenates a column of ASCII strings into one bytes buffer. Arrow-backed columns
+    already hold their strings end to end in a single data buffer, so that buffer is
+    sliced out by its offsets instead of building a joined Python string first.
+    
+    Args:
+        strings (iterable): Strings to concatenate, such as a pd.Series column or a list.
+        
+    Returns:
+        (tuple): bytes of every string, end to end, and int64 array of each string's length.
+    """
+    
+    array = getattr(strings, 'array', None)
+    pa = _pyarrow() if hasattr(array, '__arrow_array__') else None
+    
+    if pa is not None:
+        array = pa.array(array)
+        
+        if isinstance(array, pa.ChunkedArray):
+            array = array.combine_chunks()
+        
+        if (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)) and not array.null_count:
+            offsetType = np.int64 if pa.types.is_large_string(array.type) else np.int32
+            offsets = np.frombuffer(array.buffers()[1], dtype=offsetType)[array.offset:array.offset + len(array) + 1]
+            
+            data = array.buffers()[2]
+            joined = data.slice(int(offsets[0]), int(offsets[-1] - offsets[0])).to_pybytes() if data is not None else b''
+            
+            return joined, np.diff(offsets).astype(np.int64)
+    
+    strings = list(strings)
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+    
+    return ''.join(strings).encode('ascii'), lengths
+
+
+def _gcContent(seqs):
+    """Calculates the GC content (percent) of every sequence in a column at once. The
+    sequences are concatenated into one buffer and G/C/S bases are flagged with
+    bytes.translate(), then counted per sequence, rather than calling gc_content()
+    on each row. Gives the same result as gc_content().
+    
+    Args:
+        seqs (:obj: pd.Series): Column of DNA sequence strings.
+        
+    Returns:
+        (:obj: np.ndarray): GC content of each sequence in percent.
+    """
+    
+    seqbytes, seqlengths = _columnBytes(seqs)
+    isgc = np.frombuffer(seqbytes.translate(_gcTable), dtype=np.uint8)
+    
+    return _gcPercent(_readSums(isgc, seqlengths), seqlengths)
+
+
+def _gcPercent(gcCounts, seqlengths):
+    """Converts per-read G/C counts to GC content in percent. Empty sequences give 0,
+    as in gc_content().
+    
+    Args:
+        gcCounts (:obj: np.ndarray): Number of G/C/S bases in each read.
+        seqlengths (:obj: np.ndarray): Number of bases in each read.
+        
+    Returns:
+        (:obj: np.ndarray): GC content of each read in percent.
+    """
+    
+    GCpercent = np.zeros(len(seqlengths))
+    nonempty = seqlengths > 0
+    GCpercent[nonempty] = gcCounts[nonempty] * 100.0 / seqlengths[nonempty]
+    
+    return GCpercent
+
+
+def _translate(seqs):
+    """Translates every sequence in a column to amino acids at once. The sequences are
+    concatenated into one buffer of base masks with bytes.translate(), the codon at the
+    start of each whole codon is packed into an index, and all of the amino acids are
+    gathered from _codonLUT in one step. Trailing bases that do not make up a whole codon
+    are dropped. Sequences containing symbols that are not bases are passed to
+    Bio.Seq.translate(), so that the result is always the same as Bio's.
+    
+    Args:
+        seqs (iterable): DNA sequence strings, such as a pd.Series column.
+        
+    Returns:
+        (list): Amino acid string of each sequence.
+    """
+    
+    seqbytes, seqlengths = _columnBytes(seqs)
+    masks = np.frombuffer(seqbytes.translate(_baseMaskTable), dtype=np.uint8)
+    
+    # Position of the first base of every whole codon in the concatenated buffer.
+    codonCounts = seqlengths // 3
+    codonOffsets = np.concatenate(([0], np.cumsum(codonCounts)))
+    seqStarts = np.concatenate(([0], np.cumsum(seqlengths)[:-1]))
+    codonStarts = (np.repeat(seqStarts - 3 * codonOffsets[:-1], codonCounts)
+                   + 3 * np.arange(codonOffsets[-1], dtype=np.int64))
+    
+    codonIndex = ((masks[codonStarts].astype(np.uint16) << 8)
+                  | (masks[codonStarts + 1].astype(np.uint16) << 4)
+                  | masks[codonStarts + 2])
+    aminos = _codonLUT[codonIndex]
+    
+    aminoString = aminos.tobytes().decode('ascii')
+    aminoStrings = [aminoString[start:end] for start, end in zip(codonOffsets[:-1], codonOffsets[1:])]
+    
+    # Codons with a symbol that is not a base are left as 0 in _codonLUT; let Biopython handle those reads.
+    for seqIndex in np.unique(np.searchsorted(codonOffsets, np.flatnonzero(aminos == 0), side='right') - 1):
+        from Bio.Seq import Seq
+        
+        seqString = seqbytes[seqStarts[seqIndex]:seqStarts[seqIndex] + seqlengths[seqIndex]].decode('ascii')
+        aminoStrings[seqIndex] = str(Seq(seqString).translate())
+    
+    return aminoStrings
+
+
+def _stringArray(strings):
+    """Converts a list of strings into a one-dimensional DataFrame column. When pyarrow
+    is installed (and pandas supports it) the strings are stored in a single contiguous
+    Arrow buffer with an offsets array, instead of as one Python object per read.
+    
+    Args:
+        strings (list or pa.Array): List of strings, or a pyarrow array of them from _bufferColumns().
+        
+    Returns:
+        (:obj: np.ndarray or pd.api.extensions.ExtensionArray): Column data for pd.DataFrame.
+    """
+    
+    import pandas as pd
+    
+    pa = _pyarrow()
+    
+    if _pandasArrow():
+        if isinstance(strings, pa.Array):
+            return pd.arrays.ArrowExtensionArray(strings)
+        
+        return pd.array(strings, dtype=pd.ArrowDtype(pa.large_string()))
+    
+    if pa is not None and isinstance(strings, pa.Array):
+        strings = strings.to_pylist()
+    
+    return np.array(strings, dtype=object)
+
+
+def _pandasArrow():
+    """Returns True if pyarrow is installed and pandas can hold Arrow arrays as columns
+    (pandas 1.5 or later), so string columns can be stored as Arrow arrays.
+    """
+    
+    import pandas as pd
+    
+    return _pyarrow() is not None and hasattr(pd, 'ArrowDtype') and hasattr(pd.arrays, 'ArrowExtensionArray')
+
+
+def _reverseComplements(seqs):
+    """Reverse complements every sequence in a column at once, instead of calling
+    revComp() on each row. Gives the same result as revComp().
+    
+    Args:
+        seqs (:obj: pd.Series): Column of DNA sequence strings.
+        
+    Returns:
+        (:obj: np.ndarray or pd.api.extensions.ExtensionArray): Column data for pd.DataFrame.
+    """
+    
+    seqbytes, seqlengths = _columnBytes(seqs)
+    complements = np.frombuffer(seqbytes.translate(_revCompBytes), dtype=np.uint8)
+    
+    return _reversedStringArray(complements, np.concatenate(([0], np.cumsum(seqlengths))))
+
+
+def _reversedStringArray(data, offsets):
+    """Converts a buffer of strings stored end to end into a DataFrame column of each string
+    reversed. The whole buffer is flipped in one step, which reverses every string but
+    also the order of the strings, so the flipped column is read back to front.
+    
+    Args:
+        data (:obj: np.ndarray): uint8 array of every string, end to end.
+        offsets (:obj: np.ndarray): int64 array where string i is data[offsets[i]:offsets[i + 1]].
+        
+    Returns:
+        (:obj: np.ndarray or pd.api.extensions.ExtensionArray): Column data for pd.DataFrame.
+    """
+    
+    # After the flip, string i ends where it used to start, counted from the end of the buffer.
+    flippedOffsets = offsets[-1] - offsets[::-1]
+    
+    return _bufferStringArray(data[::-1].copy(), flippedOffsets)[::-1]
+
+
+def _bufferStringArray(data, offsets):
+    """Converts a buffer of ASCII strings stored end to end into a one-dimensional DataFrame
+    column, the reverse of _columnBytes(). When pyarrow is installed (and pandas supports
+    it) the buffer and offsets become the column's Arrow buffers without being copied
+    into one Python string per read.
+    
+    Args:
+        data (:obj: np.ndarray): uint8 array of every string, end to end.
+        offsets (:obj: np.ndarray): int64 array where string i is data[offsets[i]:offsets[i + 1]].
+        
+    Returns:
+        (:obj: np.ndarray or pd.api.extensions.ExtensionArray): Column data for pd.DataFrame.
+    """
+    
+    import pandas as pd
+    
+    if _pandasArrow():
+        pa = _pyarrow()
+        array = pa.LargeStringArray.from_buffers(len(offsets) - 1, pa.py_buffer(offsets.astype(np.int64)),
+                                                 pa.py_buffer(data))
+        
+        return pd.arrays.ArrowExtensionArray(array)
+    
+    text = data.tobytes().decode('ascii')
+    
+    return np.array([text[start:end] for start, end in zip(offsets[:-1], offsets[1:])], dtype=object)
+
+
+def _qualScoreMatrix(qualvalues, quallengths):
+    """Reshapes quality scores into a (reads, length) matrix when every read has the
+    same, non-zero length.
+    
+    Args:
+        qualvalues (:obj: np.ndarray): uint8 array of every read's quality scores, end to end.
+        quallengths (:obj: np.ndarray): Number of quality symbols in each read.
+        
+    Returns:
+        (:obj: np.ndarray): 2D uint8 array of quality scores, or None if read lengths differ.
+    """
+    
+    if len(quallengths) and quallengths[0] > 0 and (quallengths == quallengths[0]).all():
+        return qualvalues.reshape(len(quallengths), quallengths[0])
+    
+    return None
+
+
+def _qualMeans(qualsums, quallengths):
+    """Converts per-read quality score sums to average quality scores. Empty reads
+    have no average and give NaN.
+    
+    Args:
+        qualsums (:obj: np.ndarray): Sum of the quality scores of each read.
+        quallengths (:obj: np.ndarray): Number of quality scores in each read.
+        
+    Returns:
+        (:obj: np.ndarray): Average quality score of each read.
+    """
+    
+    qualscores = np.full(len(quallengths), np.nan)
+    nonempty = quallengths > 0
+    qualscores[nonempty] = qualsums[nonempty] / quallengths[nonempty]
+    
+    return qualscores
+
+
+def _qualRowMeans(qualMatrix):
+    """Calculates the average of each row in a (reads, length) uint8 matrix of
+    quality scores.
+    
+    Args:
+        qualMatrix (:obj: np.ndarray): 2D uint8 array with one read's quality scores per row.
+        
+    Returns:
+        (:obj: np.ndarray): Average quality score of each read.
+    """
+    
+    kernels = _numba()
+    
+    if kernels is not None:
+        return kernels.qualRowMeans(qualMatrix)
+    
+    return qualMatrix.mean(axis=1)
+
+
+@lru_cache(maxsize=None)
+def _numba():
+    """Imports numba and defines its kernels the first time they are needed, rather than
+    when fastTools is imported. Each kernel is compiled (or loaded from numba's on-disk
+    cache) the first time it is called.
+    
+    Returns:
+        (SimpleNamespace): The readSums, qualRowMeans and allStats kernels, or None
+            if numba is not installed or cannot be imported.
+    """
+    
+    try:
+        from numba import njit, prange
+    except ImportError:
+        # Also covers a numba install that does not support the installed NumPy version.
+        return None
+    
+    @njit(parallel=True, nogil=True, cache=True)
+    def readSums(values, offsets):
+        # Read i covers values[offsets[i]:offsets[i + 1]]; each read is summed on its own core.
+        sums = np.zeros(len(offsets) - 1, dtype=np.int64)
+        
+        for i in prange(len(offsets) - 1):
+            total = 0
+            
+            for j in range(offsets[i], offsets[i + 1]):
+                total += values[j]
+            
+            sums[i] = total
+        
+        return sums
+    
+    
+    @njit(parallel=True, fastmath=True, nogil=True, cache=True)
+    def qualRowMeans(qualMatrix):
+        # Each read is averaged independently, so rows are spread across cores.
+        means = np.empty(qualMatrix.shape[0])
+        
+        for i in prange(qualMatrix.shape[0]):
+            total = 0
+            
+            for j in range(qualMatrix.shape[1]):
+                total += qualMatrix[i, j]
+            
+            means[i] = total / qualMatrix.shape[1]
+        
+        return means
+    
+    
+    @njit(parallel=True, nogil=True, cache=True)
+    def allStats(seqs, seqOffsets, quals, qualOffsets, gcFlags, complements, qScores):
+        # Each read is handled on its own core: one loop over its bases counts G/C and writes
+        # their complements back to front into the read's own slot of revcomps, and one loop
+        # over its quality symbols sums their scores.
+        readCount = len(seqOffsets) - 1
+        gcCounts = np.zeros(readCount, dtype=np.int64)
+        qualSums = np.zeros(readCount, dtype=np.int64)
+        invalid = np.zeros(readCount, dtype=np.bool_)
+        revcomps = np.empty(len(seqs), dtype=np.uint8)
+        
+        for i in prange(readCount):
+            gcCount = 0
+            last = seqOffsets[i] + seqOffsets[i + 1] - 1
+            
+            for j in range(seqOffsets[i], seqOffsets[i + 1]):
+                base = seqs[j]
+                gcCount += gcFlags[base]
+                revcomps[last - j] = complements[base]
+            
+            gcCounts[i] = gcCount
+            total = 0
+            
+            for j in range(qualOffsets[i], qualOffsets[i + 1]):
+                score = qScores[quals[j]]
+                
+                if score == 255:
+                    invalid[i] = True
+                
+                total += score
+            
+            qualSums[i] = total
+        
+        return gcCounts, qualSums, invalid, revcomps
+    
+    
+    return SimpleNamespace(readSums=readSums, qualRowMeans=qualRowMeans, allStats=allStats)
+
+
+def removeNewline(x):
+    """Custom function to use with apply() in a pandas DataFrame. Simply removes
+    new line characters from strings in a column.
+    """
+    
+    x = x.strip('\n')
+    
+    return x
+     
+        
+
+      
+# Deprecated: qScoreDict is only kept for existing callers and averageQuality(method='dict').
+# Use qScoreLUT or qScoreTable, which decode whole arrays of quality symbols at once.
+qScoreDict = {'!': 0, '"': 1, '#': 2, '$': 3, '%': 4, '&': 5, '\'': 6, '(': 7, ')': 8, '*': 9, '+': 10,
+                ',': 11, '-': 12, '.': 13, '/': 14, '0': 15, '1': 16, '2': 17, '3': 18, '4': 19, '5': 20,
+                '6': 21, '7': 22, '8': 23, '9': 24, ':': 25, ';': 26, '<': 27, '=': 28, '>': 29, '?': 30,
+                '@': 31, 'A': 32, 'B': 33, 'C': 34, 'D': 35, 'E': 36, 'F': 37, 'G': 38, 'H': 39, 'I': 40,
+                'J': 41, 'K': 42}
+
+# Lookup table mapping every byte value to its Phred+33 quality score, so that an array of
+# quality symbols can be decoded with qScoreLUT[symbols]. Symbols '!' to '~' give 0 to 93,
+# and bytes that are not quality symbols give -1.
+qScoreLUT = np.full(256, -1, dtype=np.int8)
+qScoreLUT[33:127] = np.arange(94)
+
+# The same mapping as a 256-byte table for bytes.translate(), which decodes a whole buffer of
+# quality symbols in one C loop. Bytes that are not quality symbols give 255.
+qScoreTable = qScoreLUT.tobytes()
+
+# Table for bytes.translate() that maps G, C and S bases (either case) to 1 and everything else to 0.
+_gcTable = bytes(1 if chr(i) in 'GCSgcs' else 0 for i in range(256))
+
+# Table for str.translate() that maps each DNA base, including IUPAC ambiguity codes, to its complement.
+_revCompTable = str.maketrans('ACGTUMRWSYKVHDBXNacgtumrwsykvhdbxn',
+                              'TGCAAKYWSRMBDHVXNtgcaakywsrmbdhvxn')
+
+# The same complements as a 256-byte table for bytes.translate(); other bytes are left as they are.
+_revCompBytes = bytes.maketrans(b'ACGTUMRWSYKVHDBXNacgtumrwsykvhdbxn',
+                                b'TGCAAKYWSRMBDHVXNtgcaakywsrmbdhvxn')
+
+# _revCompBytes and _gcTable as NumPy arrays, for the numba kernels.
+_revCompLUT = np.frombuffer(_revCompBytes, dtype=np.uint8)
+_gcLUT = np.frombuffer(_gcTable, dtype=np.uint8)
+
+# Bit mask of the bases each IUPAC code stands for, with T=1, C=2, A=4 and G=8 (U is read as T).
+_baseMasks = {'T': 1, 'U': 1, 'C': 2, 'A': 4, 'G': 8, 'Y': 3, 'W': 5, 'K': 9, 'M': 6, 'S': 10, 'R': 12,
+              'H': 7, 'B': 11, 'D': 13, 'V': 14, 'N': 15}
+
+# Table for bytes.translate() that maps each base (either case) to its mask; bytes that are not bases map to 0.
+_baseMaskTable = bytes(_baseMasks.get(chr(i).upper(), 0) for i in range(256))
+
+# Standard genetic code, with codons in TCAG order (TTT, TTC, TTA, TTG, TCT, ...).
+_standardCode = 'FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG'
+
+
+# Amino acid codes Bio.Seq.translate() gives codons that could be either of two amino acids.
+_ambiguousAminos = {frozenset('DN'): 'B', frozenset('IL'): 'J', frozenset('EQ'): 'Z'}
+
+
+def _buildCodonLUT():
+    """Builds the amino acid lookup table used by _translate() and aa(). A codon is indexed
+    by the base masks of its three bases as 256 * first + 16 * second + third. Ambiguous
+    codons give the one amino acid that all of the codons they stand for share, and X when
+    they disagree (or B, J and Z for D/N, I/L and E/Q), the same as Bio.Seq.translate().
+    Codons containing a byte that is not a base are left as 0.
+    
+    Returns:
+        (:obj: np.ndarray): uint8 array of 4096 amino acid symbols.
+    """
+    
+    # Index of each base in TCAG order, for every mask.
+    maskBases = [[base for base in range(4) if mask & (1 << base)] for mask in range(16)]
+    
+    codonLUT = np.zeros(4096, dtype=np.uint8)
+    
+    for first in range(1, 16):
+        for second in range(1, 16):
+            for third in range(1, 16):
+                aminos = {_standardCode[16 * i + 4 * j + k]
+                          for i in maskBases[first] for j in maskBases[second] for k in maskBases[third]}
+                
+                if len(aminos) == 1:
+                    amino = aminos.pop()
+                else:
+                    amino = _ambiguousAminos.get(frozenset(aminos), 'X')
+                
+                codonLUT[256 * first + 16 * second + third] = ord(amino)
+    
+    return codonLUT
+
+
+_codonLUT = _buildCodonLUT()
+
+# The same table as bytes, for translating one string at a time in aa().
+_codonBytes = _codonLUT.tobytes()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Checks that the table-driven and numba code paths in fastTools give the same results
+as the simple per-string functions and Biopython. Run with python -m unittest.
+
+"""
+import tempfile
+import unittest
+import warnings
+from itertools import product
+from contextlib import ExitStack
+from unittest import mock
+
+import fastTools
+
+try:
+    from Bio.Seq import Seq
+except ImportError:
+    Seq = None
+
+
+# Every IUPAC nucleotide code, in both cases.
+IUPAC = 'ACGTUMRWSYKVHDBXN'
+IUPAC += IUPAC.lower()
+
+
+def _writeFastq(directory, seqs):
+    """Writes seqs to a FASTQ file in directory, with a valid quality string for each,
+    and returns its path.
+    """
+
+    path = f"{directory}/test.fastq"
+
+    with open(path, 'w', encoding='utf-8') as fastqFile:
+        for number, seq in enumerate(seqs):
+            fastqFile.write(f"@read{number}\n{seq}\n+\n{'I' * len(seq)}\n")
+
+    return path
+
+
+def _fallbacks():
+    """Yields once with every optional accelerator available, then with numba and/or
+    pyarrow switched off, so each code path is checked.
+    """
+
+    for useNumba, useArrow in ((True, True), (False, True), (True, False), (False, False)):
+        with ExitStack() as stack:
+            if not useNumba:
+                stack.enter_context(mock.patch.object(fastTools, '_numba', return_value=None))
+
+            if not useArrow:
+                stack.enter_context(mock.patch.object(fastTools, '_pyarrow', return_value=None))
+
+            yield f"numba={useNumba}, pyarrow={useArrow}"
+
+
+class ReverseComplementTest(unittest.TestCase):
+
+    @unittest.skipIf(Seq is None, "biopython is not installed")
+    def test_revCompMatchesBio(self):
+        self.assertEqual(fastTools.revComp(IUPAC), str(Seq(IUPAC).reverse_complement()))
+
+    def test_columnsMatchRevComp(self):
+        # One read of every ASCII symbol that can appear on a sequence line, plus mixed reads and an empty one.
+        symbols = ''.join(chr(i) for i in range(1, 128) if chr(i) != '\n')
+        seqs = [symbols, IUPAC, 'ACGTN' * 31, 'acgtnACGTN', 'A', '']
+        expected = [fastTools.revComp(seq) for seq in seqs]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = _writeFastq(directory, seqs)
+
+            for paths in _fallbacks():
+                with self.subTest(paths):
+                    fastq = fastTools.FastqFile(path)
+
+                    fastq.reverseComplement()
+                    self.assertEqual(list(fastq.fastqDataFrame['Reverse Complement']), expected)
+
+                    fastq.computeAll()
+                    self.assertEqual(list(fastq.fastqDataFrame['Reverse Complement']), expected)
+                    self.assertEqual(list(fastq.fastqDataFrame['GC Content']),
+                                     [fastTools.gc_content(seq) for seq in seqs])
+
+
+@unittest.skipIf(Seq is None, "biopython is not installed")
+class TranslateTest(unittest.TestCase):
+
+    def setUp(self):
+        # Bio warns about sequences that are not a whole number of codons.
+        catcher = warnings.catch_warnings()
+        catcher.__enter__()
+        self.addCleanup(catcher.__exit__, None, None, None)
+        warnings.simplefilter('ignore')
+
+    def test_codonsMatchBio(self):
+        # X is not a nucleotide code to Bio.Seq.translate().
+        codons = [''.join(codon) for codon in product(IUPAC.replace('X', '').replace('x', ''), repeat=3)]
+        expected = [str(Seq(codon).translate()) for codon in codons]
+
+        self.assertEqual([fastTools.aa(codon) for codon in codons], expected)
+        self.assertEqual(fastTools._translate(codons), expected)
+
+    def test_columnsMatchBio(self):
+        # Reads with trailing bases, ambiguous and lower case bases, stop codons and no whole codon.
+        seqs = ['ATGGCCTAA', 'ATGGCCTAAGC', 'atgNNNrayTGA', 'AT', '', 'ACGTUMRWSYKVHDBN' * 3]
+        expected = [str(Seq(seq).translate()) for seq in seqs]
+
+        self.assertEqual([fastTools.aa(seq) for seq in seqs], expected)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = _writeFastq(directory, seqs)
+
+            for paths in _fallbacks():
+                with self.subTest(paths):
+                    fastq = fastTools.FastqFile(path)
+                    fastq.aminoAcid()
+                    self.assertEqual(list(fastq.fastqDataFrame['AA Sequence']), expected)
+
+    def test_invalidCodonsRaiseLikeBio(self):
+        from Bio.Data.CodonTable import TranslationError
+
+        for seq in ('ATGTAX', 'ATG-CC'):
+            with self.subTest(seq):
+                self.assertRaises(TranslationError, Seq(seq).translate)
+                self.assertRaises(TranslationError, fastTools.aa, seq)
+                self.assertRaises(TranslationError, fastTools._translate, ['ATG', seq])
+
+
+if __name__ == '__main__':
+    unittest.main()